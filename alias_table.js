@@ -0,0 +1,111 @@
+// Math.random() carries 52 random bits: the low 32 flip the biased coin and
+// the rest pick the column, so one draw covers both.
+const RANDOM_BITS = 52;
+const COIN_BITS = 32;
+const COIN_RANGE = 2 ** COIN_BITS;
+const MAX_SINGLE_DRAW_SIZE = 2 ** (RANDOM_BITS - COIN_BITS);
+
+/**
+ * @template T
+ * @typedef {{
+ *   size: number,
+ *   sample(random?: () => number): T|null,
+ *   sampleMany(count: number, random?: () => number): T[]
+ * }} AliasTable
+ */
+
+/**
+ * Builds a Vose alias table so weighted picks cost O(1) instead of a scan.
+ * @template T
+ * @param {Array<[T, number]>} entries value and weight pairs
+ * @returns {AliasTable<T>}
+ */
+export function createAliasTable(entries) {
+    const size = entries.length;
+    const values = entries.map(([value]) => value);
+
+    // Zero-weight padding up to a power of two turns the column pick into a mask.
+    let tableSize = 1;
+    while (tableSize < size) tableSize *= 2;
+    const mask = tableSize - 1;
+
+    const thresholds = new Float64Array(tableSize);
+    const alias = new Int32Array(tableSize);
+
+    const totalWeight = entries.reduce((sum, [, weight]) => sum + weight, 0);
+    const scaled = new Float64Array(tableSize);
+    // Worklists of column indexes, preallocated since neither outgrows the table.
+    const small = new Int32Array(tableSize);
+    const large = new Int32Array(tableSize);
+    let smallCount = 0;
+    let largeCount = 0;
+
+    for (let index = 0; index < tableSize; index++) {
+        scaled[index] = index < size ? entries[index][1] * tableSize / totalWeight : 0;
+        if (scaled[index] < 1) {
+            small[smallCount++] = index;
+        } else {
+            large[largeCount++] = index;
+        }
+    }
+
+    while (smallCount > 0 && largeCount > 0) {
+        const lesser = small[--smallCount];
+        const greater = large[--largeCount];
+
+        thresholds[lesser] = Math.floor(scaled[lesser] * COIN_RANGE);
+        alias[lesser] = greater;
+        scaled[greater] -= 1 - scaled[lesser];
+        if (scaled[greater] < 1) {
+            small[smallCount++] = greater;
+        } else {
+            large[largeCount++] = greater;
+        }
+    }
+
+    // Leftovers are only off from 1 by floating point error.
+    for (const index of [...small.subarray(0, smallCount), ...large.subarray(0, largeCount)]) {
+        thresholds[index] = COIN_RANGE;
+        alias[index] = index;
+    }
+
+    /**
+     * @param {() => number} random
+     * @returns {T}
+     */
+    function draw(random) {
+        const bits = Math.floor(random() * 2 ** RANDOM_BITS);
+        const column = tableSize <= MAX_SINGLE_DRAW_SIZE
+            ? Math.floor(bits / COIN_RANGE) & mask
+            : Math.floor(random() * tableSize);
+
+        return (bits >>> 0) < thresholds[column] ? values[column] : values[alias[column]];
+    }
+
+    return {
+        size,
+
+        /**
+         * @param {() => number} random
+         * @returns {T|null}
+         */
+        sample(random = Math.random) {
+            return size === 0 ? null : draw(random);
+        },
+
+        /**
+         * @param {number} count
+         * @param {() => number} random
+         * @returns {T[]}
+         */
+        sampleMany(count, random = Math.random) {
+            if (size === 0) return [];
+
+            const picks = new Array(count);
+            for (let index = 0; index < count; index++) {
+                picks[index] = draw(random);
+            }
+            return picks;
+        }
+    };
+}
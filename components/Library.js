@@ -28,6 +28,8 @@ class Library extends HTMLElement {
         this._songs = [];
         /** @type {SongScoreService|null} */
         this._scoreService = null;
+        /** @type {Array<{ row: HTMLElement, searchText: string }>} */
+        this._searchIndex = [];
     }
 
     connectedCallback() {
@@ -160,15 +162,14 @@ class Library extends HTMLElement {
 
     _filterSongs(query) {
         const q = query.toLowerCase();
-        const rows = this.shadowRoot.querySelectorAll('.song-row');
-        rows.forEach(row => {
-            const name = row.getAttribute('data-path').toLowerCase();
-            row.style.display = name.includes(q) ? '' : 'none';
+        this._searchIndex.forEach(({ row, searchText }) => {
+            row.style.display = searchText.includes(q) ? '' : 'none';
         });
     }
 
     updateLibrary(songs) {
         this._songs = songs;
+        this._searchIndex = [];
         const list = this.shadowRoot.querySelector('.song-list');
         list.innerHTML = '';
 
@@ -211,6 +212,7 @@ class Library extends HTMLElement {
             });
 
             list.appendChild(row);
+            this._searchIndex.push({ row, searchText: path.toLowerCase() });
         });
     }
 
@@ -2,13 +2,48 @@ import { MIN_SCORE, MAX_SCORE, DEFAULT_SCORE } from './config.js';
 
 const DEFAULT_PERSIST_DELAY_MS = 5000;
 
+// sql.js keeps the database in memory and durability comes from persist(),
+// so there is no point journaling to or syncing the in-memory file system.
+// These are per-connection and export() reopens the connection, so they are
+// applied again after every export.
+const DATABASE_PRAGMAS = /*sql*/`
+    PRAGMA journal_mode = MEMORY;
+    PRAGMA synchronous = OFF;
+    PRAGMA temp_store = MEMORY;
+`;
+
+const DATABASE_SCHEMA = /*sql*/`
+    CREATE TABLE IF NOT EXISTS song_scores (
+        path TEXT PRIMARY KEY,
+        score INTEGER,
+        last_played TIMESTAMP
+    );
+    CREATE INDEX IF NOT EXISTS idx_song_scores_score ON song_scores (score DESC, path);
+`;
+
+/**
+ * @typedef {{
+ *   bind(params?: Array): boolean,
+ *   step(): boolean,
+ *   get(): Array,
+ *   reset(): boolean,
+ *   free(): boolean
+ * }} PreparedStatement
+ */
+
 /**
  * Creates a song repository around a database-like object.
  * @param {{
- *   database: { exec(query: string, params?: Array): Array, export(): Uint8Array },
+ *   database: {
+ *     exec(query: string): Array,
+ *     prepare(query: string): PreparedStatement,
+ *     export(): Uint8Array,
+ *     close(): void
+ *   },
  *   persist?: (data: Uint8Array) => Promise<void>,
  *   now?: () => number,
  *   schedule?: (callback: () => void | Promise<void>, delay: number) => unknown,
+ *   cancel?: (handle: unknown) => void,
  *   persistDelayMs?: number
  * }} options
  */
@@ -17,26 +52,127 @@ export function createSongRepositoryFromDatabase({
     persist = async () => {},
     now = () => Date.now(),
     schedule = (callback, delay) => setTimeout(callback, delay),
+    cancel = (handle) => clearTimeout(/** @type {number} */ (handle)),
     persistDelayMs = DEFAULT_PERSIST_DELAY_MS
 }) {
     let persistHandle = null;
+    /** @type {Promise<void>} */
+    let persistInFlight = Promise.resolve();
+    /** @type {Map<string, PreparedStatement>} */
+    const statements = new Map();
+
+    /**
+     * sql.js frees every prepared statement and resets connection pragmas on
+     * export(), so the statement cache is dropped and the pragmas applied again.
+     * @returns {Uint8Array}
+     */
+    function exportDatabase() {
+        statements.clear();
+        const data = database.export();
+        database.exec(DATABASE_PRAGMAS);
+        return data;
+    }
+
+    /**
+     * Queues a write behind any in flight, so writes to the file never overlap
+     * and each exports the latest data.
+     * @returns {Promise<void>}
+     */
+    function persistNow() {
+        persistHandle = null;
+        persistInFlight = persistInFlight
+            .catch(() => {})
+            .then(() => persist(exportDatabase()));
+        return persistInFlight;
+    }
 
     async function saveDatabase() {
         if (persistHandle) return;
 
-        persistHandle = schedule(async () => {
-            await persist(database.export());
-            persistHandle = null;
-        }, persistDelayMs);
+        persistHandle = schedule(persistNow, persistDelayMs);
+    }
+
+    /**
+     * Writes out pending changes now instead of waiting for the scheduled save.
+     * A failed write rejects the flush that awaits it, but not later ones.
+     * @returns {Promise<void>}
+     */
+    async function flush() {
+        if (persistHandle) {
+            cancel(persistHandle);
+            void persistNow();
+        }
+        const pending = persistInFlight;
+        persistInFlight = pending.catch(() => {});
+        await pending;
+    }
+
+    /**
+     * Binds a statement, reusing its prepared form across calls.
+     * @param {string} query
+     * @param {Array} params
+     * @returns {PreparedStatement}
+     */
+    function bindStatement(query, params) {
+        let statement = statements.get(query);
+        if (!statement) {
+            statement = database.prepare(query);
+            statements.set(query, statement);
+        }
+
+        statement.bind(params);
+        return statement;
     }
 
     /**
      * @param {string} query
      * @param {Array} params
-     * @returns {Array}
+     * @returns {Array<Array>}
      */
     function runQuery(query, params = []) {
-        return database.exec(query, params);
+        const statement = bindStatement(query, params);
+        try {
+            const rows = [];
+            while (statement.step()) {
+                rows.push(statement.get());
+            }
+            return rows;
+        } finally {
+            statement.reset();
+        }
+    }
+
+    /**
+     * Runs a statement and returns only its first row, if any.
+     * @param {string} query
+     * @param {Array} params
+     * @returns {Array|null}
+     */
+    function runQueryOne(query, params = []) {
+        const statement = bindStatement(query, params);
+        try {
+            return statement.step() ? statement.get() : null;
+        } finally {
+            statement.reset();
+        }
+    }
+
+    /**
+     * Runs the callback's statements as one transaction instead of one per statement.
+     * @template T
+     * @param {() => T} callback
+     * @returns {T}
+     */
+    function runInTransaction(callback) {
+        runQuery(/*sql*/`BEGIN IMMEDIATE`);
+        try {
+            const result = callback();
+            runQuery(/*sql*/`COMMIT`);
+            return result;
+        } catch (error) {
+            runQuery(/*sql*/`ROLLBACK`);
+            throw error;
+        }
     }
 
     /**
@@ -44,8 +180,8 @@ export function createSongRepositoryFromDatabase({
      * @returns {number}
      */
     function readScore(path) {
-        const result = runQuery(/*sql*/`SELECT score FROM song_scores WHERE path = ? LIMIT 1`, [path]);
-        return result.length > 0 && result[0].values.length > 0 ? result[0].values[0][0] : DEFAULT_SCORE;
+        const row = runQueryOne(/*sql*/`SELECT score FROM song_scores WHERE path = ? LIMIT 1`, [path]);
+        return row ? row[0] : DEFAULT_SCORE;
     }
 
     /**
@@ -69,16 +205,21 @@ export function createSongRepositoryFromDatabase({
         return boundedScore;
     }
 
+    database.exec(DATABASE_PRAGMAS);
+
     return {
         /**
          * @param {string[]} musicFiles
          * @returns {Promise<void>}
          */
         async addMissing(musicFiles) {
-            for (const file of musicFiles) {
-                runQuery(/*sql*/`INSERT OR IGNORE INTO song_scores (path, score, last_played) VALUES (?, ?, ?)`,
-                    [file, DEFAULT_SCORE, now()]);
-            }
+            const addedAt = now();
+            runInTransaction(() => {
+                for (const file of musicFiles) {
+                    runQuery(/*sql*/`INSERT OR IGNORE INTO song_scores (path, score, last_played) VALUES (?, ?, ?)`,
+                        [file, DEFAULT_SCORE, addedAt]);
+                }
+            });
             await saveDatabase();
         },
 
@@ -86,8 +227,9 @@ export function createSongRepositoryFromDatabase({
          * @returns {Array<[string, number]>}
          */
         listRanked() {
-            const result = runQuery(/*sql*/`SELECT path, score FROM song_scores ORDER BY score DESC`);
-            return result.length > 0 ? result[0].values : [];
+            return /** @type {Array<[string, number]>} */ (
+                runQuery(/*sql*/`SELECT path, score FROM song_scores ORDER BY score DESC`)
+            );
         },
 
         /**
@@ -106,7 +248,31 @@ export function createSongRepositoryFromDatabase({
          * @returns {Promise<number>}
          */
         async changeScore(path, increment) {
-            return setScore(path, readScore(path) + increment);
+            const [score] = runQueryOne(/*sql*/`
+                INSERT INTO song_scores (path, score, last_played) VALUES (?, ?, ?)
+                ON CONFLICT(path) DO UPDATE SET
+                    score = MAX(?, MIN(?, score + ?)),
+                    last_played = excluded.last_played
+                RETURNING score`,
+                [path, clampScore(DEFAULT_SCORE + increment), now(), MIN_SCORE, MAX_SCORE, increment]);
+            await saveDatabase();
+            return score;
+        },
+
+        flush,
+
+        /**
+         * Writes out any pending changes and releases the database.
+         * @returns {Promise<void>}
+         */
+        async close() {
+            try {
+                await flush();
+            } finally {
+                statements.forEach(statement => statement.free());
+                statements.clear();
+                database.close();
+            }
         }
     };
 }
@@ -138,12 +304,7 @@ export async function createSongRepository(folderHandle) {
         dbFileHandle = await folderHandle.getFileHandle('music_db.sqlite', { create: true });
     }
 
-    database.run(/*sql*/`
-    CREATE TABLE IF NOT EXISTS song_scores (
-        path TEXT PRIMARY KEY,
-        score INTEGER,
-        last_played TIMESTAMP
-    )`);
+    database.exec(DATABASE_SCHEMA);
 
     return createSongRepositoryFromDatabase({
         database,
@@ -21,6 +21,7 @@ import './components/Playlist.js';
 
     /** @type {FileSystemDirectoryHandle|null} */
     let musicFolderHandle = null;
+    let songRepository = null;
     let songCatalog = null;
     let songScores = null;
     let unsubscribeFromScoreChanges = null;
@@ -40,11 +41,7 @@ import './components/Playlist.js';
         nowPlayingScoreEl,
         onNext: () => playlistComponent.playNext(),
         onPrevious: () => playlistComponent.playPrevious(),
-        onEnded: () => {
-            playlistComponent.handleSongEnd();
-            void updateLibrary();
-            playerController.refreshCurrentScore();
-        },
+        onEnded: () => playlistComponent.handleSongEnd(),
         onPlaybackStateChange: (isPlaying) => {
             playlistComponent.isPlaying = isPlaying;
         },
@@ -77,6 +74,12 @@ import './components/Playlist.js';
         animateBtn(downvoteBtn);
     });
 
+    document.addEventListener('visibilitychange', () => {
+        if (document.visibilityState === 'hidden') {
+            songRepository?.flush().catch(error => console.error('Error saving music database:', error));
+        }
+    });
+
     libraryComponent.addEventListener('play-song', (event) => void playSong(event.detail.song));
     playlistComponent.addEventListener('play-song', (event) => void playSong(event.detail.song));
 
@@ -126,7 +129,12 @@ import './components/Playlist.js';
         musicFolderHandle = folderHandle;
 
         try {
-            const songRepository = await createSongRepository(folderHandle);
+            // Write out the old folder's pending changes before its file may be
+            // reopened, but keep it usable until the new repository is in place.
+            await songRepository?.flush().catch(error => console.error('Error saving previous music folder:', error));
+            const previousRepository = songRepository;
+            songRepository = await createSongRepository(folderHandle);
+            previousRepository?.close().catch(error => console.error('Error closing previous music folder:', error));
             const services = createSongCatalogServices(songRepository);
             songCatalog = services.songCatalog;
             songScores = services.songScores;
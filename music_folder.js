@@ -1,4 +1,4 @@
-const AUDIO_EXTENSIONS = ['.mp3', '.wav', '.ogg', '.flac', '.m4a', '.aac', '.opus', '.wma', '.ape', '.alac', '.aiff', '.mid', '.midi'];
+const AUDIO_EXTENSIONS = new Set(['.mp3', '.wav', '.ogg', '.flac', '.m4a', '.aac', '.opus', '.wma', '.ape', '.alac', '.aiff', '.mid', '.midi']);
 
 /**
  * Recursively lists audio files within a selected folder.
@@ -13,9 +13,9 @@ export async function scanAudioFiles(dirHandle, path = '') {
         if (entry.kind === 'file') {
             const fileHandle = /** @type {FileSystemFileHandle} */ (entry);
             const fileName = fileHandle.name.toLowerCase();
-            const fileExtension = '.' + fileName.split('.').pop();
+            const fileExtension = fileName.slice(fileName.lastIndexOf('.'));
 
-            if (AUDIO_EXTENSIONS.includes(fileExtension)) {
+            if (AUDIO_EXTENSIONS.has(fileExtension)) {
                 files.push(`${path}${fileHandle.name}`);
                 continue;
             }
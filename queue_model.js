@@ -9,7 +9,7 @@ import { MAX_PLAYLIST_SIZE } from './config.js';
 
 /**
  * @param {{
- *   queueSource: { pickWeighted(): string|null },
+ *   queueSource: { pickWeighted(): string|null, pickWeightedMany?(count: number): string[] },
  *   songScores: { change(path: string, delta: number): Promise<number> },
  *   maxSize?: number,
  *   minSkipPenaltyMs?: number,
@@ -53,10 +53,13 @@ export function createQueueModel({
         return () => listeners.delete(listener);
     }
 
-    /** @returns {string|null} */
-    function playCurrent() {
+    /**
+     * @param {number} startTime
+     * @returns {string|null}
+     */
+    function playCurrent(startTime = now()) {
         if (playlist.length === 0) return null;
-        playStartTime = now();
+        playStartTime = startTime;
         notify();
         return playlist[currentIndex];
     }
@@ -118,17 +121,30 @@ export function createQueueModel({
         notify();
     }
 
+    /**
+     * @param {number} count
+     * @returns {string[]}
+     */
+    function pickCandidates(count) {
+        if (queueSource.pickWeightedMany) return queueSource.pickWeightedMany(count);
+
+        const newSong = queueSource.pickWeighted();
+        return newSong ? [newSong] : [];
+    }
+
     function fill() {
         let maxTries = 10;
         let changed = false;
 
         while (playlist.length - currentIndex < maxSize) {
-            const newSong = queueSource.pickWeighted();
-            if (!newSong) break;
-
-            if (!playlist.slice(-maxSize).includes(newSong) || maxTries-- <= 0) {
-                playlist.push(newSong);
-                changed = true;
+            const candidates = pickCandidates(maxSize - (playlist.length - currentIndex));
+            if (candidates.length === 0) break;
+
+            for (const newSong of candidates) {
+                if (!playlist.slice(-maxSize).includes(newSong) || maxTries-- <= 0) {
+                    playlist.push(newSong);
+                    changed = true;
+                }
             }
         }
 
@@ -139,12 +155,13 @@ export function createQueueModel({
     function playNext() {
         if (playlist.length === 0) return null;
 
-        if (playStartTime && now() - playStartTime < minSkipPenaltyMs) {
+        const currentTime = now();
+        if (playStartTime && currentTime - playStartTime < minSkipPenaltyMs) {
             void updateCurrentSongScore(-1);
         }
 
         currentIndex = (currentIndex + 1) % playlist.length;
-        return playCurrent();
+        return playCurrent(currentTime);
     }
 
     /** @returns {string|null} */
@@ -1,3 +1,20 @@
+import { MIN_SCORE, MAX_SCORE } from './config.js';
+import { createAliasTable } from './alias_table.js';
+
+// Scores are clamped to a small range, so their 2 ** score weights are precomputed.
+const SCORE_WEIGHTS = Float64Array.from(
+    { length: MAX_SCORE - MIN_SCORE + 1 },
+    (_, index) => 2 ** (MIN_SCORE + index)
+);
+
+/**
+ * @param {number} score
+ * @returns {number}
+ */
+function getWeight(score) {
+    return SCORE_WEIGHTS[score - MIN_SCORE] ?? 2 ** score;
+}
+
 /**
  * @param {{
  *   addMissing(paths: string[]): Promise<void>,
@@ -9,14 +26,24 @@
  */
 export function createSongCatalogServices(songRepository) {
     const listeners = new Set();
+    /** @type {import('./alias_table.js').AliasTable<string>|null} */
+    let aliasTable = null;
 
     /**
      * @param {{ song: string, score: number }} event
      */
     function notify(event) {
+        aliasTable = null;
         listeners.forEach(listener => listener(event));
     }
 
+    function getAliasTable() {
+        aliasTable ??= createAliasTable(
+            songCatalog.listRanked().map(([path, score]) => [path, getWeight(score)])
+        );
+        return aliasTable;
+    }
+
     const songCatalog = {
         /**
          * @param {string[]} paths
@@ -24,6 +51,7 @@ export function createSongCatalogServices(songRepository) {
          */
         async addMissing(paths) {
             await songRepository.addMissing(paths);
+            aliasTable = null;
         },
 
         /**
@@ -80,18 +108,15 @@ export function createSongCatalogServices(songRepository) {
          * @returns {string|null}
          */
         pickWeighted() {
-            const songs = songCatalog.listRanked();
-            if (songs.length === 0) return null;
-
-            const totalComputedScore = songs.reduce((sum, [, score]) => sum + 2 ** score, 0);
-            let random = Math.random() * totalComputedScore;
-
-            for (const [path, score] of songs) {
-                random -= 2 ** score;
-                if (random <= 0) return path;
-            }
+            return getAliasTable().sample();
+        },
 
-            return songs[Math.floor(Math.random() * songs.length)][0];
+        /**
+         * @param {number} count
+         * @returns {string[]}
+         */
+        pickWeightedMany(count) {
+            return getAliasTable().sampleMany(count);
         }
     };
 
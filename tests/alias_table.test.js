@@ -0,0 +1,42 @@
+import { describe, expect, test } from 'bun:test';
+import { createAliasTable } from '../alias_table.js';
+
+/**
+ * Encodes a column and a 32-bit coin into a single Math.random()-like draw.
+ * @param {number} column
+ * @param {number} coin
+ */
+function draw(column, coin) {
+    return () => (column * 2 ** 32 + coin) / 2 ** 52;
+}
+
+describe('createAliasTable', () => {
+    test('sample keeps light columns and redirects the rest to their alias', () => {
+        const table = createAliasTable([['song-a.mp3', 1], ['song-b.mp3', 3]]);
+
+        expect(table.size).toBe(2);
+        expect(table.sample(draw(0, 2 ** 31 - 1))).toBe('song-a.mp3');
+        expect(table.sample(draw(0, 2 ** 31))).toBe('song-b.mp3');
+        expect(table.sample(draw(1, 2 ** 32 - 1))).toBe('song-b.mp3');
+    });
+
+    test('sample never lands on the padding columns', () => {
+        const table = createAliasTable([['song-a.mp3', 1], ['song-b.mp3', 1], ['song-c.mp3', 2]]);
+
+        expect(table.size).toBe(3);
+        expect(table.sample(draw(3, 0))).toBeDefined();
+        expect(table.sample(draw(3, 2 ** 32 - 1))).toBeDefined();
+    });
+
+    test('sampleMany draws one pick per random draw', () => {
+        const table = createAliasTable([['song-a.mp3', 1], ['song-b.mp3', 3]]);
+        const draws = [draw(0, 0), draw(0, 2 ** 31), draw(1, 0)];
+
+        expect(table.sampleMany(3, () => draws.shift()())).toEqual(['song-a.mp3', 'song-b.mp3', 'song-b.mp3']);
+    });
+
+    test('sample returns null for an empty table', () => {
+        expect(createAliasTable([]).sample()).toBeNull();
+        expect(createAliasTable([]).sampleMany(3)).toEqual([]);
+    });
+});
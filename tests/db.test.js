@@ -6,19 +6,67 @@ class FakeDatabase {
         this.rows = new Map(
             Object.entries(initialRows).map(([path, score]) => [path, { score, lastPlayed: 0 }])
         );
+        this.pragmaScripts = [];
+        this.transactions = [];
+        this.preparedQueries = [];
+        this.freedQueries = [];
+        this.openStatements = new Set();
     }
 
-    exec(query, params = []) {
+    prepare(query) {
+        this.preparedQueries.push(query);
+        let params = [];
+        let rows = null;
+        let freed = false;
+        const statement = {
+            bind: (values = []) => {
+                if (freed) throw new Error('Statement closed');
+                params = values;
+                rows = null;
+                return true;
+            },
+            step: () => {
+                rows ??= this.query(query, params);
+                return rows.length > 0;
+            },
+            get: () => rows.shift(),
+            reset: () => {
+                params = [];
+                rows = null;
+                return true;
+            },
+            free: () => {
+                freed = true;
+                this.openStatements.delete(statement);
+                this.freedQueries.push(query);
+                return true;
+            }
+        };
+        this.openStatements.add(statement);
+        return statement;
+    }
+
+    exec(query) {
+        if (!query.includes('PRAGMA')) throw new Error(`Unsupported script: ${query}`);
+        this.pragmaScripts.push(query);
+        return [];
+    }
+
+    query(query, params) {
+        if (['BEGIN IMMEDIATE', 'COMMIT', 'ROLLBACK'].includes(query)) {
+            this.transactions.push(query);
+            return [];
+        }
+
         if (query.includes('SELECT score FROM song_scores WHERE path = ? LIMIT 1')) {
             const record = this.rows.get(params[0]);
-            return record ? [{ values: [[record.score]] }] : [];
+            return record ? [[record.score]] : [];
         }
 
         if (query.includes('SELECT path, score FROM song_scores ORDER BY score DESC')) {
-            const values = [...this.rows.entries()]
+            return [...this.rows.entries()]
                 .sort((left, right) => right[1].score - left[1].score)
                 .map(([path, record]) => [path, record.score]);
-            return values.length > 0 ? [{ values }] : [];
         }
 
         if (query.includes('INSERT OR IGNORE INTO song_scores')) {
@@ -29,6 +77,16 @@ class FakeDatabase {
             return [];
         }
 
+        if (query.includes('ON CONFLICT(path) DO UPDATE')) {
+            const [path, insertScore, lastPlayed, minScore, maxScore, increment] = params;
+            const record = this.rows.get(path);
+            const score = record
+                ? Math.max(minScore, Math.min(maxScore, record.score + increment))
+                : insertScore;
+            this.rows.set(path, { score, lastPlayed });
+            return [[score]];
+        }
+
         if (query.includes('INSERT OR REPLACE INTO song_scores')) {
             const [path, score, lastPlayed] = params;
             this.rows.set(path, { score, lastPlayed });
@@ -38,14 +96,20 @@ class FakeDatabase {
         throw new Error(`Unsupported query: ${query}`);
     }
 
+    // Like sql.js, exporting frees every prepared statement.
     export() {
+        this.openStatements.forEach(statement => statement.free());
         return new Uint8Array();
     }
+
+    close() {
+        this.closed = true;
+    }
 }
 
-function createImmediateRepository(initialRows = {}) {
+function createImmediateRepository(initialRows = {}, database = new FakeDatabase(initialRows)) {
     return createSongRepositoryFromDatabase({
-        database: new FakeDatabase(initialRows),
+        database,
         persist: async () => {},
         schedule: (callback) => {
             void callback();
@@ -70,6 +134,52 @@ describe('createSongRepositoryFromDatabase', () => {
         ]);
     });
 
+    test('addMissing inserts every song within a single transaction', async () => {
+        const database = new FakeDatabase();
+        let clockReads = 0;
+        const repository = createSongRepositoryFromDatabase({
+            database,
+            schedule: () => null,
+            now: () => ++clockReads
+        });
+
+        await repository.addMissing(['song-a.mp3', 'song-b.mp3', 'song-c.mp3']);
+
+        expect(database.transactions).toEqual(['BEGIN IMMEDIATE', 'COMMIT']);
+        expect(repository.listRanked()).toHaveLength(3);
+        expect(clockReads).toBe(1);
+    });
+
+    test('queries are prepared once and reused until the repository closes', async () => {
+        const database = new FakeDatabase();
+        const repository = createSongRepositoryFromDatabase({ database, schedule: () => null });
+
+        await repository.addMissing(['song-a.mp3', 'song-b.mp3']);
+        await repository.addMissing(['song-c.mp3']);
+        repository.getScore('song-a.mp3');
+        repository.getScore('song-b.mp3');
+        await repository.close();
+
+        expect(new Set(database.preparedQueries).size).toBe(database.preparedQueries.length);
+        expect(database.freedQueries).toEqual(database.preparedQueries);
+    });
+
+    test('queries keep working after the database is persisted', async () => {
+        const repository = createImmediateRepository({ 'song-a.mp3': 1 });
+
+        await repository.setScore('song-a.mp3', 5);
+        await repository.flush();
+        expect(repository.getScore('song-a.mp3')).toBe(5);
+        expect(await repository.changeScore('song-a.mp3', 1)).toBe(6);
+        await repository.addMissing(['song-b.mp3']);
+        await repository.flush();
+
+        expect(repository.listRanked()).toEqual([
+            ['song-a.mp3', 6],
+            ['song-b.mp3', 2]
+        ]);
+    });
+
     test('setScore clamps values and repositories do not share state', async () => {
         const firstRepository = createImmediateRepository({ 'song-a.mp3': 1 });
         const secondRepository = createImmediateRepository({ 'song-a.mp3': 1 });
@@ -80,4 +190,146 @@ describe('createSongRepositoryFromDatabase', () => {
         expect(firstRepository.getScore('song-a.mp3')).toBe(20);
         expect(secondRepository.getScore('song-a.mp3')).toBe(-1);
     });
+
+    test('pragmas are applied on open and again after every export', async () => {
+        const database = new FakeDatabase();
+        const repository = createImmediateRepository({}, database);
+
+        await repository.setScore('song-a.mp3', 3);
+        await repository.setScore('song-a.mp3', 4);
+        await repository.flush();
+
+        expect(database.pragmaScripts).toHaveLength(3);
+    });
+
+    test('flush persists pending changes immediately and lets later changes reschedule', async () => {
+        const persisted = [];
+        const scheduled = [];
+        const repository = createSongRepositoryFromDatabase({
+            database: new FakeDatabase(),
+            persist: async (data) => {
+                persisted.push(data);
+            },
+            schedule: (callback) => {
+                scheduled.push(callback);
+                return scheduled.length;
+            },
+            cancel() {}
+        });
+
+        await repository.setScore('song-a.mp3', 3);
+        await repository.flush();
+        await repository.flush();
+        await repository.setScore('song-a.mp3', 4);
+
+        expect(persisted).toHaveLength(1);
+        expect(scheduled).toHaveLength(2);
+    });
+
+    test('the repository keeps working after flushing a pending save', async () => {
+        const database = new FakeDatabase({ 'song-a.mp3': 1 });
+        const persisted = [];
+        const repository = createSongRepositoryFromDatabase({
+            database,
+            persist: async (data) => {
+                persisted.push(data);
+            },
+            schedule: () => 'pending-save',
+            cancel() {}
+        });
+
+        await repository.changeScore('song-a.mp3', 1);
+        await repository.flush();
+
+        expect(repository.getScore('song-a.mp3')).toBe(2);
+        expect(await repository.changeScore('song-a.mp3', 1)).toBe(3);
+        expect(repository.listRanked()).toEqual([['song-a.mp3', 3]]);
+        await repository.flush();
+        expect(persisted).toHaveLength(2);
+    });
+
+    test('close waits for an in-flight save and flushes changes made during it', async () => {
+        const database = new FakeDatabase();
+        const scheduled = [];
+        const cancelled = [];
+        const finishWrites = [];
+        const repository = createSongRepositoryFromDatabase({
+            database,
+            persist: () => new Promise(resolve => finishWrites.push(resolve)),
+            schedule: (callback) => {
+                scheduled.push(callback);
+                return scheduled.length;
+            },
+            cancel: (handle) => cancelled.push(handle)
+        });
+
+        await repository.setScore('song-a.mp3', 3);
+        void scheduled[0]();
+        await repository.setScore('song-a.mp3', 4);
+        const closing = repository.close();
+
+        expect(scheduled).toHaveLength(2);
+        expect(cancelled).toEqual([2]);
+        expect(finishWrites).toHaveLength(1);
+
+        finishWrites[0]();
+        await new Promise(resolve => setTimeout(resolve, 0));
+        expect(finishWrites).toHaveLength(2);
+        expect(database.closed).toBeUndefined();
+
+        finishWrites[1]();
+        await closing;
+        expect(database.closed).toBe(true);
+    });
+
+    test('changeScore starts unknown songs from the default score', async () => {
+        const repository = createImmediateRepository();
+
+        expect(await repository.changeScore('new.mp3', 1)).toBe(3);
+        expect(await repository.changeScore('new.mp3', 1)).toBe(4);
+        expect(repository.getScore('new.mp3')).toBe(4);
+    });
+
+    test('close flushes a pending persist once and closes the database', async () => {
+        const database = new FakeDatabase();
+        const persisted = [];
+        const cancelled = [];
+        const repository = createSongRepositoryFromDatabase({
+            database,
+            persist: async (data) => {
+                persisted.push(data);
+            },
+            schedule: () => 'pending-save',
+            cancel: (handle) => cancelled.push(handle)
+        });
+
+        await repository.setScore('song-a.mp3', 3);
+        await repository.close();
+
+        expect(cancelled).toEqual(['pending-save']);
+        expect(persisted).toHaveLength(1);
+        expect(database.closed).toBe(true);
+    });
+
+    test('a failed save is reported once and does not block later flushes or close', async () => {
+        const database = new FakeDatabase();
+        const persisted = [];
+        const repository = createSongRepositoryFromDatabase({
+            database,
+            persist: async (data) => {
+                if (persisted.push(data) === 1) throw new Error('disk full');
+            },
+            schedule: () => 'pending-save',
+            cancel() {}
+        });
+
+        await repository.setScore('song-a.mp3', 3);
+        await expect(repository.flush()).rejects.toThrow('disk full');
+        await repository.flush();
+        await repository.setScore('song-a.mp3', 4);
+        await repository.close();
+
+        expect(persisted).toHaveLength(2);
+        expect(database.closed).toBe(true);
+    });
 });
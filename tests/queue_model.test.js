@@ -26,6 +26,32 @@ describe('createQueueModel', () => {
         });
     });
 
+    test('fill requests the missing songs in one batch when the source supports it', () => {
+        const requestedCounts = [];
+        const model = createQueueModel({
+            queueSource: {
+                pickWeighted() {
+                    throw new Error('fill should use pickWeightedMany');
+                },
+                pickWeightedMany(count) {
+                    requestedCounts.push(count);
+                    return ['song-a.mp3', 'song-b.mp3', 'song-c.mp3'].slice(0, count);
+                }
+            },
+            songScores: {
+                async change() {
+                    return 0;
+                }
+            },
+            maxSize: 3
+        });
+
+        model.fill();
+
+        expect(requestedCounts).toEqual([3]);
+        expect(model.getState().playlist).toEqual(['song-a.mp3', 'song-b.mp3', 'song-c.mp3']);
+    });
+
     test('playNext penalizes a fast skip on the current song', async () => {
         const scoreChanges = [];
         let currentTime = 1000;
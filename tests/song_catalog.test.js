@@ -33,4 +33,35 @@ describe('createSongCatalogServices', () => {
             { song: 'song-a.mp3', score: 3 }
         ]);
     });
+
+    test('queueSource reuses the weighted table until a score changes', async () => {
+        let listCalls = 0;
+        let songs = [['song-a.mp3', 0]];
+        const services = createSongCatalogServices({
+            async addMissing() {},
+            listRanked() {
+                listCalls += 1;
+                return songs;
+            },
+            getScore() {
+                return 0;
+            },
+            async setScore(path, score) {
+                songs = [[path, score]];
+                return score;
+            },
+            async changeScore(path, delta) {
+                return delta;
+            }
+        });
+
+        expect(services.queueSource.pickWeighted()).toBe('song-a.mp3');
+        expect(services.queueSource.pickWeighted()).toBe('song-a.mp3');
+        expect(listCalls).toBe(1);
+
+        await services.songScores.set('song-b.mp3', 3);
+
+        expect(services.queueSource.pickWeighted()).toBe('song-b.mp3');
+        expect(listCalls).toBe(2);
+    });
 });